@@ -1,22 +1,41 @@
-from uagents import Agent, Context
-import aiohttp
+from uagents import Agent, Context, Protocol
 import asyncio
+import hashlib
+import math
 import os
 from dotenv import load_dotenv
-import requests
 import json
 
+from cluster import UNICORN_PORT, UNICORN_SEED
+from messages import STATUS_BUSY, STATUS_ERROR, STATUS_OK, RebalanceRequest, RebalanceResult
+from prompts import PromptTemplate
+from rate_limit import REQUEST_TIMEOUT_S, CircuitOpenError, build_limiters
+from token_feed import DEFAULT_FEED_URL, TokenFeed
+from work_queue import WorkQueue
+
+# aiohttp and requests are imported lazily inside the functions that use them
+# to keep agent cold-start fast.
+
 # Load environment variables
 load_dotenv()
 
+# Own port so it can run next to the valuator workers (8000+)
+PORT = int(os.getenv("UNICORN_PORT", str(UNICORN_PORT)))
+
 # instantiate agent
 agent = Agent(
     name="UNICORN_Index_Agent",
-    seed="unicorn_index_fund_secret_seed",
-    port=8000,
-    endpoint=["http://localhost:8000/submit"]
+    seed=UNICORN_SEED,
+    port=PORT,
+    endpoint=[f"http://localhost:{PORT}/submit"]
 )
 
+# ASI1 quota is rate limited and circuit-broken per provider
+limiters = build_limiters()
+
+# Local merged snapshot of the app's token feed
+token_feed = TokenFeed(os.getenv("TOKEN_FEED_URL", DEFAULT_FEED_URL))
+
 # Main prompt from constants.ts
 MAIN_PROMPT = """You are a professional crypto asset strategist managing the UNICORN index, a basket of selected crypto tokens.
 
@@ -37,16 +56,6 @@ Instructions:
 - You are only allowed to trade among the tokens already in the index (no new assets).
 - **Do not include explanations, reasoning, or any text outside of the JSON object.**
 
----
-
-**Market Conditions:**  
-{market_conditions}
-**Token Universe:**  
-{token_universe}
-**Current Index Composition:**  
-{current_index_composition}
-
----
 ⚠️ Final Output:
 Return a single valid JSON object like below (with your suggested `REBALANCE_INDEX` values):
 
@@ -58,24 +67,27 @@ Return a single valid JSON object like below (with your suggested `REBALANCE_IND
   ...
 }}
 ```
+
+---
+
+**Market Conditions:**  
+{market_conditions}
+**Token Universe:**  
+{token_universe}
+**Current Index Composition:**  
+{current_index_composition}
 """
 
+# Compiled once; everything above the first field is a stable, cacheable prefix
+MAIN_TEMPLATE = PromptTemplate(
+    MAIN_PROMPT,
+    system="You are a professional crypto asset strategist. Return only valid JSON as requested.",
+)
+
 # Function to fetch data from API endpoint
 async def fetch_data_from_api(ctx: Context):
-    """Fetch data from the local API endpoint"""
-    try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get("http://localhost:3000/api/fetch-data") as response:
-                if response.status == 200:
-                    data = await response.json()
-                    # ctx.logger.info(f"Successfully fetched data: {data}")
-                    return data
-                else:
-                    ctx.logger.error(f"Failed to fetch data. Status: {response.status}")
-                    return None
-    except Exception as e:
-        ctx.logger.error(f"Error fetching data from API: {str(e)}")
-        return None
+    """Refresh the local token snapshot from the API feed (only changed tokens are transferred)"""
+    return await token_feed.refresh(ctx)
 
 # Function to call AS1 API with the data
 async def analyze_with_as1(ctx: Context, api_data):
@@ -87,24 +99,13 @@ async def analyze_with_as1(ctx: Context, api_data):
             ctx.logger.error("ASI_ONE_API_KEY not found in environment variables")
             return None
         
-        # Prepare the prompt with the API data
-        # Handle the case where api_data might be a list or dict
-        if isinstance(api_data, list):
-            # If it's a list of tokens, use it as token universe
-            token_universe = api_data
-            market_conditions = "Current market conditions data"
-            current_index_composition = "Equal weight distribution"  # Default assumption
-        else:
-            # If it's a dict, extract the fields
-            token_universe = api_data.get("token_universe", api_data)
-            market_conditions = api_data.get("market_conditions", "Current market conditions data")
-            current_index_composition = api_data.get("current_index_composition", "Equal weight distribution")
-        
-        formatted_prompt = MAIN_PROMPT.format(
-            market_conditions=market_conditions,
-            token_universe=json.dumps(token_universe, indent=2),
-            current_index_composition=json.dumps(current_index_composition, indent=2)
+        # Prepare the prompt with the API data (normalized by TokenFeed.snapshot)
+        prompt = MAIN_TEMPLATE.render(
+            market_conditions=api_data["market_conditions"],
+            token_universe=api_data["token_universe"],
+            current_index_composition=api_data["current_index_composition"],
         )
+        ctx.logger.info(f"Prompt tokens by section (~{prompt.total_tokens} total): {prompt.tokens}")
         
         ctx.logger.info("Sending data to AS1 API for analysis...")
         
@@ -113,16 +114,7 @@ async def analyze_with_as1(ctx: Context, api_data):
         
         payload = json.dumps({
             "model": "asi1-mini",
-            "messages": [
-                {
-                    "role": "system",
-                    "content": "You are a professional crypto asset strategist. Return only valid JSON as requested."
-                },
-                {
-                    "role": "user",
-                    "content": formatted_prompt
-                }
-            ],
+            "messages": MAIN_TEMPLATE.messages(prompt),
             "temperature": 0.7,
             "stream": False,
             "max_tokens": 1000
@@ -134,8 +126,22 @@ async def analyze_with_as1(ctx: Context, api_data):
             'Authorization': f'Bearer {as1_api_key}'
         }
         
-        # Make AS1 API request
-        response = requests.post(url, headers=headers, data=payload)
+        # Make AS1 API request (requests is blocking, so keep it off the event loop)
+        import requests
+
+        loop = asyncio.get_running_loop()
+
+        async def do_request():
+            response = await loop.run_in_executor(
+                None, lambda: requests.post(url, headers=headers, data=payload, timeout=REQUEST_TIMEOUT_S)
+            )
+            return response.status_code, response.headers, response
+
+        try:
+            _, _, response = await limiters["asi1"].call(do_request, ctx.logger)
+        except CircuitOpenError as e:
+            ctx.logger.error(str(e))
+            return None
         
         if response.status_code == 200:
             response_data = response.json()
@@ -166,12 +172,26 @@ async def analyze_with_as1(ctx: Context, api_data):
         ctx.logger.error(f"Error calling AS1 API: {str(e)}")
         return None
 
+# Strong references to in-flight background tasks so they are not garbage collected
+_background_tasks = set()
+
 # startup handler
 @agent.on_event("startup")
 async def startup_function(ctx: Context):
     ctx.logger.info(f"Hello, I'm agent {agent.name} and my address is {agent.address}.")
     ctx.logger.info("UNICORN Index Agent is ready to manage multichain index fund operations!")
     
+    rebalance_queue.start()
+    ctx.logger.info(f"Serving RebalanceRequest with {rebalance_queue.concurrency} workers (queue size {rebalance_queue.maxsize})")
+    
+    # Run the initial rebalance in the background so the agent comes up immediately
+    task = asyncio.create_task(run_initial_rebalance(ctx))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+async def run_initial_rebalance(ctx: Context):
+    """Fetch the token universe and log a rebalancing recommendation."""
     # Fetch data from API on startup
     ctx.logger.info("Fetching initial data from API...")
     api_data = await fetch_data_from_api(ctx)
@@ -187,6 +207,73 @@ async def startup_function(ctx: Context):
     else:
         ctx.logger.error("Failed to fetch data from API")
 
+# --- Message-driven rebalancing API ---
+# Seconds a client should wait before retrying when the queue is full
+BUSY_RETRY_AFTER_S = 30.0
+
+rebalance_protocol = Protocol(name="UNICORNRebalance", version="0.1.0")
+
+# Range of a REBALANCE_INDEX signal, as requested in MAIN_PROMPT
+SIGNAL_MIN = -1.0
+SIGNAL_MAX = 1.0
+
+
+def parse_signals(analysis_result):
+    """Validate AS1's {symbol: signal} answer. Returns (signals, None) or (None, error)."""
+    if not isinstance(analysis_result, dict):
+        return None, "AS1 did not return a JSON object"
+    signals = {}
+    for symbol, value in analysis_result.items():
+        # bool is an int subclass; reject it explicitly
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return None, f"signal for {symbol} is not a number: {value!r}"
+        value = float(value)
+        if math.isnan(value) or not SIGNAL_MIN <= value <= SIGNAL_MAX:
+            return None, f"signal for {symbol} must be between {SIGNAL_MIN:g} and {SIGNAL_MAX:g}, got {value}"
+        signals[symbol] = value
+    return signals, None
+
+
+def _rebalance_error_reply(key, exc):
+    return RebalanceResult(status=STATUS_ERROR, error=str(exc))
+
+
+rebalance_queue = WorkQueue(
+    "rebalance",
+    _rebalance_error_reply,
+    maxsize=int(os.getenv("REBALANCE_QUEUE_SIZE", "16")),
+    concurrency=int(os.getenv("REBALANCE_WORKERS", "1")),
+)
+
+
+@rebalance_protocol.on_message(model=RebalanceRequest, replies=RebalanceResult)
+async def handle_rebalance_request(ctx: Context, sender: str, msg: RebalanceRequest):
+    overrides = {}
+    if msg.market_conditions is not None:
+        overrides["market_conditions"] = msg.market_conditions
+    if msg.current_index_composition is not None:
+        overrides["current_index_composition"] = msg.current_index_composition
+    # Identical requests share one fetch + AS1 round trip
+    key = "rebalance:" + hashlib.sha1(json.dumps(overrides, sort_keys=True).encode()).hexdigest()[:12]
+    ctx.logger.info(f"RebalanceRequest from {sender}")
+
+    async def job():
+        api_data = await fetch_data_from_api(ctx)
+        if not api_data:
+            return RebalanceResult(status=STATUS_ERROR, error="Failed to fetch data from API")
+        analysis_result = await analyze_with_as1(ctx, {**api_data, **overrides})
+        signals, error = parse_signals(analysis_result)
+        if error:
+            ctx.logger.error(f"Rejected AS1 signals: {error}")
+            return RebalanceResult(status=STATUS_ERROR, error=error)
+        return RebalanceResult(status=STATUS_OK, signals=signals)
+
+    if not rebalance_queue.submit(ctx, sender, key, job):
+        await ctx.send(sender, RebalanceResult(status=STATUS_BUSY, retry_after_s=BUSY_RETRY_AFTER_S))
+
+
+agent.include(rebalance_protocol, publish_manifest=True)
+
 # Commented out periodic fetching as requested
 # @agent.on_interval(period=30.0)
 # async def periodic_data_fetch(ctx: Context):
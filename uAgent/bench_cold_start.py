@@ -0,0 +1,124 @@
+"""Cold-start benchmark for the uAgents in this directory.
+
+Measures two things for an agent script, each in a fresh interpreter:
+
+1. Import time  - how long `import <module>` takes (and whether web3 got pulled in).
+2. Ready time   - how long from process spawn until the agent's HTTP endpoint
+                  accepts connections, i.e. until it can receive messages.
+
+Usage:
+    python bench_cold_start.py                        # RWA_Valuator, port 8000
+    python bench_cold_start.py UNICORN_Index_Agent --runs 5   # port 8100
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+from cluster import UNICORN_PORT, VALUATOR_BASE_PORT
+
+# Targets for a warm disk cache on a developer laptop
+IMPORT_TARGET_S = 1.5
+READY_TARGET_S = 3.0
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Port each agent listens on when run standalone
+DEFAULT_PORTS = {
+    "RWA_Valuator": VALUATOR_BASE_PORT,
+    "UNICORN_Index_Agent": UNICORN_PORT,
+}
+
+IMPORT_SNIPPET = """
+import sys, time
+t = time.perf_counter()
+import {module}
+print(time.perf_counter() - t, 'web3' in sys.modules)
+"""
+
+
+def measure_import(module):
+    """Return (seconds, web3_loaded) for importing `module` in a fresh interpreter."""
+    out = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET.format(module=module)],
+        cwd=HERE,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.strip().splitlines()[-1]
+    seconds, web3_loaded = out.split()
+    return float(seconds), web3_loaded == "True"
+
+
+def measure_ready(module, port, timeout):
+    """Return seconds from spawn until `port` accepts TCP connections, or None on timeout."""
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, f"{module}.py"],
+        cwd=HERE,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            if proc.poll() is not None:
+                return None
+            try:
+                with socket.create_connection(("127.0.0.1", port), timeout=0.1):
+                    return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.05)
+        return None
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def report(label, samples, target):
+    if not samples:
+        print(f"{label:<8} ❌ no successful samples")
+        return False
+    median = statistics.median(samples)
+    ok = median <= target
+    print(
+        f"{label:<8} median {median:.3f}s  min {min(samples):.3f}s  max {max(samples):.3f}s"
+        f"  target {target:.1f}s  {'✅' if ok else '❌'}"
+    )
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("module", nargs="?", default="RWA_Valuator")
+    parser.add_argument("--port", type=int, help="defaults to the module's standalone port")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    args = parser.parse_args()
+    if args.port is None:
+        args.port = DEFAULT_PORTS.get(args.module, VALUATOR_BASE_PORT)
+
+    import_samples = []
+    ready_samples = []
+    for _ in range(args.runs):
+        seconds, web3_loaded = measure_import(args.module)
+        import_samples.append(seconds)
+        if web3_loaded:
+            print("⚠️ web3 was imported at module load time")
+        ready = measure_ready(args.module, args.port, args.timeout)
+        if ready is not None:
+            ready_samples.append(ready)
+
+    print(f"🚀 Cold start for {args.module} ({args.runs} runs)")
+    ok = report("import", import_samples, IMPORT_TARGET_S)
+    ok = report("ready", ready_samples, READY_TARGET_S) and ok
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
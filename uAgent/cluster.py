@@ -0,0 +1,90 @@
+"""Helpers for running several RWA Valuator workers side by side.
+
+Each worker gets a port and seed derived from its index, so addresses are
+stable across restarts. Property jobs are assigned to workers by consistent
+hashing on `property_id`: adding or removing a worker only moves ~1/N of the
+properties, and a given property is always valued by the same worker.
+"""
+import bisect
+import hashlib
+import json
+import os
+
+VALUATOR_BASE_SEED = "rwa_real_estate_valuator_seed"
+VALUATOR_BASE_PORT = 8000
+UNICORN_SEED = "unicorn_index_fund_secret_seed"
+UNICORN_PORT = 8100
+
+# Written by launch.py, read by clients that need to route ValuationRequests
+MANIFEST_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "workers.json")
+
+
+def worker_name(index):
+    return f"valuator-{index}"
+
+
+def worker_seed(index, count, base_seed=VALUATOR_BASE_SEED):
+    """A single worker keeps the original seed (and therefore its address)."""
+    return base_seed if count == 1 else f"{base_seed}_worker_{index}"
+
+
+def worker_port(index, base_port=VALUATOR_BASE_PORT):
+    return base_port + index
+
+
+def worker_index(name):
+    return int(name.rsplit("-", 1)[1])
+
+
+def worker_address(index, count, base_seed=VALUATOR_BASE_SEED):
+    """uAgents address of a worker, derived from its seed the same way Agent does."""
+    from uagents.crypto import Identity
+
+    return Identity.from_seed(worker_seed(index, count, base_seed), 0).address
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+
+class HashRing:
+    """Consistent hash ring with virtual nodes."""
+
+    def __init__(self, nodes, replicas=64):
+        self._ring = sorted(
+            (_hash(f"{node}#{i}"), node) for node in nodes for i in range(replicas)
+        )
+        self._keys = [h for h, _ in self._ring]
+
+    def node_for(self, key):
+        if not self._ring:
+            raise ValueError("HashRing has no nodes")
+        i = bisect.bisect(self._keys, _hash(key)) % len(self._ring)
+        return self._ring[i][1]
+
+
+def valuator_ring(count):
+    return HashRing([worker_name(i) for i in range(count)])
+
+
+def load_manifest(path=MANIFEST_PATH):
+    with open(path) as f:
+        return json.load(f)
+
+
+class ValuatorPool:
+    """Routes property ids to valuator worker addresses using the launcher manifest."""
+
+    def __init__(self, workers):
+        self._workers = {w["name"]: w for w in workers}
+        self._ring = HashRing(list(self._workers))
+
+    @classmethod
+    def from_manifest(cls, path=MANIFEST_PATH):
+        return cls(load_manifest(path)["valuators"])
+
+    def worker_for(self, property_id):
+        return self._workers[self._ring.node_for(property_id)]
+
+    def address_for(self, property_id):
+        return self.worker_for(property_id)["address"]
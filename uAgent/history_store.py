@@ -0,0 +1,286 @@
+"""Columnar history of valuations, scores and provider snapshots.
+
+Every valuation is appended as a small Arrow IPC file under a hive-style
+partition:
+
+    history/property_id=PROP001/date=2026-10-19/<timestamp>-<id>.arrow
+
+Files are written uncompressed so reads can memory-map them. Per-property
+queries open only that property's directory. Each writer creates its own
+files, so several valuator workers can share one directory. `compact` merges
+a finished day's files into one so the file count stays at one per property
+per day.
+
+pyarrow is optional: without it `HistoryStore.available()` is False and the
+agent skips recording.
+"""
+import json
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+from urllib.parse import quote, unquote
+
+DEFAULT_HISTORY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "history")
+
+# Where a valuation came from: the agent's own target-property run, or a
+# ValuationRequest from another agent. Only the former feeds later prompts.
+SOURCE_ONCHAIN = "onchain"
+SOURCE_REQUEST = "request"
+
+
+def _pa():
+    import pyarrow as pa
+
+    return pa
+
+
+def _schema():
+    pa = _pa()
+    return pa.schema([
+        ("recorded_at", pa.timestamp("s", tz="UTC")),
+        ("source", pa.string()),
+        ("address", pa.string()),
+        ("valuation_usd", pa.int64()),
+        ("size_sqm", pa.int32()),
+        ("default_risk_score", pa.uint8()),
+        ("location_score", pa.uint8()),
+        ("zillow_fetched_at", pa.timestamp("s", tz="UTC")),
+        ("zillow_snapshot", pa.string()),
+        ("rentcast_fetched_at", pa.timestamp("s", tz="UTC")),
+        ("rentcast_snapshot", pa.string()),
+    ])
+
+
+def _partition_dir(property_id):
+    # pyarrow URI-decodes hive segments on read, so encode them on write
+    return f"property_id={quote(str(property_id), safe='')}"
+
+
+def _is_data_file(name):
+    # Dot-files are in-flight writes
+    return name.endswith(".arrow") and not name.startswith(".")
+
+
+def _write_table(table, directory, name):
+    pa = _pa()
+    path = os.path.join(directory, name)
+    # Write to a dot-file (ignored by dataset discovery) and rename so
+    # readers never see a partial file
+    tmp_path = os.path.join(directory, f".{name}.tmp")
+    with pa.OSFile(tmp_path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _conform(table):
+    """`table` in the current schema, with nulls for columns older files lack."""
+    pa = _pa()
+    schema = _schema()
+    columns = [
+        table.column(f.name) if f.name in table.column_names else pa.nulls(table.num_rows, f.type)
+        for f in schema
+    ]
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+def _empty(schema, columns=None):
+    table = schema.empty_table()
+    return table.select(columns) if columns is not None else table
+
+
+class HistoryStore:
+    def __init__(self, root=None):
+        self.root = root or os.getenv("HISTORY_DIR", DEFAULT_HISTORY_DIR)
+
+    @staticmethod
+    def available():
+        try:
+            _pa()
+        except ImportError:
+            return False
+        return True
+
+    # --- writes ---
+
+    def append(self, valuation, snapshots=(), recorded_at=None, source=SOURCE_ONCHAIN):
+        """Append one Valuation (and the ProviderSnapshots it was built from). Returns the file path."""
+        pa = _pa()
+        recorded_at = datetime.fromtimestamp(recorded_at or time.time(), tz=timezone.utc)
+        by_provider = {s.provider: s for s in snapshots}
+
+        def snapshot_columns(provider):
+            snapshot = by_provider.get(provider)
+            if snapshot is None:
+                return None, None
+            fetched_at = datetime.fromtimestamp(snapshot.fetched_at, tz=timezone.utc)
+            return fetched_at, json.dumps(snapshot.data, separators=(",", ":"))
+
+        zillow_at, zillow_json = snapshot_columns("zillow")
+        rentcast_at, rentcast_json = snapshot_columns("rentcast")
+        row = {
+            "recorded_at": recorded_at,
+            "source": source,
+            "address": valuation.address,
+            "valuation_usd": valuation.valuation_usd,
+            "size_sqm": valuation.size_sqm,
+            "default_risk_score": valuation.default_risk_score,
+            "location_score": valuation.location_score,
+            "zillow_fetched_at": zillow_at,
+            "zillow_snapshot": zillow_json,
+            "rentcast_fetched_at": rentcast_at,
+            "rentcast_snapshot": rentcast_json,
+        }
+        table = pa.Table.from_pylist([row], schema=_schema())
+
+        partition = os.path.join(
+            self.root,
+            _partition_dir(valuation.property_id),
+            f"date={recorded_at.strftime('%Y-%m-%d')}",
+        )
+        root = os.path.realpath(self.root)
+        if os.path.commonpath([root, os.path.realpath(partition)]) != root:
+            raise ValueError(f"property_id {valuation.property_id!r} escapes the history directory")
+        os.makedirs(partition, exist_ok=True)
+        name = f"{recorded_at.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}.arrow"
+        return _write_table(table, partition, name)
+
+    def property_ids(self):
+        """Ids of every property with recorded history."""
+        if not os.path.isdir(self.root):
+            return []
+        prefix = "property_id="
+        return sorted(
+            unquote(e.name[len(prefix):]) for e in os.scandir(self.root) if e.is_dir() and e.name.startswith(prefix)
+        )
+
+    # --- compaction ---
+
+    def compact(self, property_id=None, before=None):
+        """Merge each day's small files into one, for days before `before` (YYYY-MM-DD, default today).
+
+        The current day is left alone because writers are still appending to
+        it. Run at most one compaction per property at a time. Returns the
+        number of files removed.
+        """
+        pa = _pa()
+        before = before or datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        properties = [property_id] if property_id is not None else self.property_ids()
+
+        removed = 0
+        for property_id in properties:
+            property_dir = os.path.join(self.root, _partition_dir(property_id))
+            if not os.path.isdir(property_dir):
+                continue
+            for day in os.scandir(property_dir):
+                if not day.is_dir() or not day.name.startswith("date=") or day.name[len("date="):] >= before:
+                    continue
+                paths = sorted(e.path for e in os.scandir(day.path) if _is_data_file(e.name))
+                if len(paths) < 2:
+                    continue
+                tables = [pa.ipc.open_file(pa.memory_map(path)).read_all() for path in paths]
+                table = pa.concat_tables([_conform(t) for t in tables]).sort_by("recorded_at")
+                name = f"compacted-{uuid.uuid4().hex[:8]}.arrow"
+                _write_table(table, day.path, name)
+                for path in paths:
+                    os.remove(path)
+                removed += len(paths)
+        return removed
+
+    # --- reads ---
+
+    def _query(self, path, partition_fields, filter_expr=None, columns=None):
+        """Scan the Arrow files under `path`, memory-mapped. Missing or empty directories give an empty table."""
+        import pyarrow.dataset as ds
+        from pyarrow import fs
+
+        pa = _pa()
+        partition_schema = pa.schema([(name, pa.string()) for name in partition_fields])
+        schema = pa.unify_schemas([_schema(), partition_schema])
+        if not os.path.isdir(path):
+            return _empty(schema, columns)
+        dataset = ds.dataset(
+            path,
+            schema=schema,
+            format="arrow",
+            partitioning=ds.partitioning(partition_schema, flavor="hive"),
+            filesystem=fs.LocalFileSystem(use_mmap=True),
+        )
+        if not dataset.files:
+            return _empty(schema, columns)
+        return dataset.to_table(filter=filter_expr, columns=columns)
+
+    def time_series(self, property_id, start=None, end=None, columns=None, source=None):
+        """Valuations for one property between `start`/`end` (YYYY-MM-DD, inclusive), oldest first.
+
+        Only that property's partition is scanned. Pass `source` to keep only
+        rows recorded with it. Snapshot columns are large; pass `columns` to
+        read only what you need.
+        """
+        import pyarrow.dataset as ds
+
+        pa = _pa()
+        expr = None
+        if start:
+            expr = ds.field("date") >= start
+        if end:
+            expr = ds.field("date") <= end if expr is None else expr & (ds.field("date") <= end)
+        if source:
+            expr = ds.field("source") == source if expr is None else expr & (ds.field("source") == source)
+        if columns is None:
+            columns = [
+                "recorded_at", "property_id", "valuation_usd",
+                "default_risk_score", "location_score", "size_sqm",
+            ]
+        # property_id is implied by the directory, so add it back rather than scan for it
+        wanted = [c for c in columns if c != "property_id"]
+        scan_columns = wanted if "recorded_at" in wanted else wanted + ["recorded_at"]
+        table = self._query(
+            os.path.join(self.root, _partition_dir(property_id)), ["date"], expr, scan_columns
+        ).sort_by("recorded_at").select(wanted)
+        if "property_id" in columns:
+            table = table.add_column(
+                columns.index("property_id"),
+                pa.field("property_id", pa.string()),
+                pa.array([property_id] * table.num_rows, pa.string()),
+            )
+        return table
+
+    def latest(self, property_id, source=SOURCE_ONCHAIN):
+        """The most recent row for a property as a dict, or None. `source=None` includes every source."""
+        table = self.time_series(property_id, source=source)
+        return table.slice(table.num_rows - 1).to_pylist()[0] if table.num_rows else None
+
+    def portfolio_summary(self, date=None, source=SOURCE_ONCHAIN):
+        """Latest valuation per property (optionally as of `date`) and portfolio totals.
+
+        Only rows from `source` count, so ValuationRequests from other agents
+        cannot move the totals; pass `source=None` to include every source.
+        """
+        import pyarrow.dataset as ds
+
+        expr = ds.field("date") <= date if date else None
+        if source:
+            expr = ds.field("source") == source if expr is None else expr & (ds.field("source") == source)
+        table = self._query(
+            self.root,
+            ["property_id", "date"],
+            expr,
+            ["recorded_at", "property_id", "valuation_usd", "default_risk_score", "location_score"],
+        ).sort_by("recorded_at")
+
+        latest = {}
+        for row in table.to_pylist():
+            latest[row["property_id"]] = row
+        properties = sorted(latest.values(), key=lambda r: r["property_id"])
+
+        count = len(properties)
+        return {
+            "properties": properties,
+            "property_count": count,
+            "total_valuation_usd": sum(r["valuation_usd"] for r in properties),
+            "avg_risk_score": sum(r["default_risk_score"] for r in properties) / count if count else None,
+            "avg_location_score": sum(r["location_score"] for r in properties) / count if count else None,
+        }
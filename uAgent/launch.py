@@ -0,0 +1,123 @@
+"""Run N RWA Valuator workers (and optionally the UNICORN Index agent) on one host.
+
+Each valuator runs in its own process so valuations use every core. Ports and
+seeds are derived from the worker index (see cluster.py), and the resulting
+addresses are written to workers.json so clients can route a ValuationRequest
+to the worker that owns a property:
+
+    from cluster import ValuatorPool
+    await ctx.send(ValuatorPool.from_manifest().address_for("PROP001"), request)
+
+Usage:
+    python launch.py --workers 4
+    python launch.py --workers 4 --base-port 9000 --no-index
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+
+from uagents.crypto import Identity
+
+from cluster import (
+    MANIFEST_PATH,
+    UNICORN_PORT,
+    UNICORN_SEED,
+    VALUATOR_BASE_PORT,
+    worker_address,
+    worker_name,
+    worker_port,
+)
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def build_manifest(workers, base_port, index_port):
+    valuators = []
+    for i in range(workers):
+        port = worker_port(i, base_port)
+        valuators.append({
+            "name": worker_name(i),
+            "index": i,
+            "port": port,
+            "endpoint": f"http://localhost:{port}/submit",
+            "address": worker_address(i, workers),
+        })
+    manifest = {"valuators": valuators}
+    if index_port is not None:
+        manifest["unicorn"] = {
+            "port": index_port,
+            "endpoint": f"http://localhost:{index_port}/submit",
+            "address": Identity.from_seed(UNICORN_SEED, 0).address,
+        }
+    return manifest
+
+
+def spawn(script, env_overrides):
+    env = dict(os.environ, **{k: str(v) for k, v in env_overrides.items()})
+    return subprocess.Popen([sys.executable, script], cwd=HERE, env=env)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--base-port", type=int, default=VALUATOR_BASE_PORT)
+    parser.add_argument("--index-port", type=int, default=UNICORN_PORT)
+    parser.add_argument("--no-index", action="store_true", help="do not start the UNICORN Index agent")
+    args = parser.parse_args()
+
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if not args.no_index and args.base_port <= args.index_port < args.base_port + args.workers:
+        parser.error(f"--index-port {args.index_port} collides with valuator ports")
+
+    manifest = build_manifest(args.workers, args.base_port, None if args.no_index else args.index_port)
+    with open(MANIFEST_PATH, "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    # Every process started here calls ASI1, so they all split its quota
+    asi1_share = args.workers + (0 if args.no_index else 1)
+
+    procs = []
+    for worker in manifest["valuators"]:
+        print(f"🚀 {worker['name']} on port {worker['port']} -> {worker['address']}")
+        procs.append(spawn("RWA_Valuator.py", {
+            "VALUATOR_WORKER_INDEX": worker["index"],
+            "VALUATOR_WORKER_COUNT": args.workers,
+            "VALUATOR_BASE_PORT": args.base_port,
+            "ASI1_SHARE": asi1_share,
+        }))
+    if not args.no_index:
+        print(f"🚀 UNICORN Index agent on port {args.index_port}")
+        procs.append(spawn("UNICORN_Index_Agent.py", {
+            "UNICORN_PORT": args.index_port,
+            "ASI1_SHARE": asi1_share,
+        }))
+    print(f"📄 Manifest written to {MANIFEST_PATH}")
+
+    def shutdown(*_, code=0):
+        for proc in procs:
+            if proc.poll() is None:
+                proc.terminate()
+        for proc in procs:
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        sys.exit(code)
+
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+
+    # Exit (and stop the rest) as soon as any worker dies
+    while all(proc.poll() is None for proc in procs):
+        time.sleep(1)
+    print("💥 A worker exited, shutting down")
+    shutdown(code=1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""uAgents protocol messages shared by the RWA Valuator and UNICORN Index agents."""
+from typing import Dict, Optional
+
+from uagents import Model
+
+# Reply statuses
+STATUS_OK = "ok"
+STATUS_ERROR = "error"
+STATUS_BUSY = "busy"  # queue full, retry after `retry_after_s`
+STATUS_WRONG_WORKER = "wrong_worker"  # resend to `owner_address`
+
+
+class ValuationRequest(Model):
+    property_id: str
+    address: str
+    valuation_usd: int
+    size_sqm: int
+    default_risk_score: int
+    location_score: int
+
+
+class ValuationResult(Model):
+    property_id: str
+    status: str
+    valuation_usd: Optional[int] = None
+    default_risk_score: Optional[int] = None
+    location_score: Optional[int] = None
+    error: Optional[str] = None
+    retry_after_s: Optional[float] = None
+    owner_address: Optional[str] = None
+
+
+class RebalanceRequest(Model):
+    market_conditions: Optional[str] = None
+    current_index_composition: Optional[Dict[str, float]] = None
+
+
+class RebalanceResult(Model):
+    status: str
+    signals: Dict[str, float] = {}
+    error: Optional[str] = None
+    retry_after_s: Optional[float] = None
@@ -0,0 +1,94 @@
+"""Precompiled prompt templates.
+
+A PromptTemplate parses its `str.format`-style template once into literal
+segments and field names. Rendering then only joins strings, with non-string
+values serialized as compact canonical JSON (sorted keys, no whitespace)
+instead of `indent=2`, which can double the size of large provider payloads.
+
+Templates are written with every static part (role, instructions, output
+format) ahead of the first field. That gives each request a byte-identical
+prefix, which providers with automatic prefix caching can reuse between calls.
+
+`render` also reports an estimated token count per section for budgeting.
+tiktoken is used when installed, otherwise ~4 characters per token.
+"""
+import json
+import math
+import string
+
+CHARS_PER_TOKEN = 4
+
+_encoder = None
+
+
+def estimate_tokens(text):
+    global _encoder
+    if _encoder is None:
+        try:
+            import tiktoken
+
+            _encoder = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoder = False
+    if _encoder:
+        return len(_encoder.encode(text))
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def compact_json(value):
+    return json.dumps(value, separators=(",", ":"), sort_keys=True, ensure_ascii=False)
+
+
+class RenderedPrompt:
+    __slots__ = ("text", "tokens")
+
+    def __init__(self, text, tokens):
+        self.text = text
+        self.tokens = tokens  # section name -> estimated tokens
+
+    @property
+    def total_tokens(self):
+        return sum(self.tokens.values())
+
+
+class PromptTemplate:
+    def __init__(self, template, system=None):
+        self.system = system
+        self._segments = []  # [(literal, field_name or None)]
+        for literal, field, spec, conversion in string.Formatter().parse(template):
+            if spec or conversion:
+                raise ValueError(f"format specs are not supported in prompt fields: {field}")
+            self._segments.append((literal, field))
+        self.fields = tuple(field for _, field in self._segments if field is not None)
+        # Counted on first render: loading the tokenizer at import would slow agent startup
+        self._static_tokens = None
+
+    def render(self, **values):
+        missing = [field for field in self.fields if field not in values]
+        if missing:
+            raise KeyError(f"missing prompt fields: {', '.join(missing)}")
+
+        if self._static_tokens is None:
+            self._static_tokens = {
+                "system": estimate_tokens(self.system) if self.system else 0,
+                "static": estimate_tokens("".join(literal for literal, _ in self._segments)),
+            }
+        parts = []
+        tokens = dict(self._static_tokens)
+        for literal, field in self._segments:
+            parts.append(literal)
+            if field is None:
+                continue
+            value = values[field]
+            text = value if isinstance(value, str) else compact_json(value)
+            parts.append(text)
+            tokens[field] = estimate_tokens(text)
+        return RenderedPrompt("".join(parts), tokens)
+
+    def messages(self, rendered):
+        """Chat messages with the static system message first, then the rendered prompt."""
+        messages = []
+        if self.system:
+            messages.append({"role": "system", "content": self.system})
+        messages.append({"role": "user", "content": rendered.text})
+        return messages
@@ -0,0 +1,235 @@
+"""Per-provider rate limiting, Retry-After backoff and circuit breaking.
+
+Every outbound call to Zillow (RapidAPI), Rentcast and ASI1 goes through a
+ProviderLimiter:
+
+- a token bucket keeps the request rate at or under the provider quota,
+- 429/5xx responses are retried after `Retry-After` (or exponential backoff
+  with jitter), and a 429 pauses the whole bucket so concurrent callers don't
+  pile on,
+- after repeated failures the circuit opens and calls fail fast with
+  CircuitOpenError until a cool-down passes; callers then fall back to the
+  last good response kept by `remember`/`recall`.
+
+Rates are per process. Pass `share=N` to `build_limiters` when N processes
+split one quota; `<PROVIDER>_SHARE` overrides it for one provider, e.g. when
+ASI1 is shared by the valuator workers and the UNICORN Index agent.
+"""
+import asyncio
+import os
+import random
+import time
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+
+# provider -> (requests per second, burst)
+PROVIDER_DEFAULTS = {
+    "zillow": (2.0, 5),
+    "rentcast": (1.0, 3),
+    "asi1": (1.0, 3),
+}
+
+# Upper bound on a single blocking HTTP call made through a limiter
+REQUEST_TIMEOUT_S = 60
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose circuit is open."""
+
+    def __init__(self, provider, retry_in):
+        super().__init__(f"{provider} circuit open, retry in {retry_in:.1f}s")
+        self.provider = provider
+        self.retry_in = retry_in
+
+
+def parse_retry_after(value):
+    """Return seconds to wait from a Retry-After header (delta-seconds or HTTP-date)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = None  # created on first use so it binds to the running loop
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def pause(self, seconds):
+        """Hold all callers for `seconds` (e.g. after a 429) and drain the bucket."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0.0
+
+    async def acquire(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class CircuitBreaker:
+    """closed -> open after `failure_threshold` consecutive failures; one trial call after `reset_timeout`."""
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._open_until = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self):
+        if self._open_until is None:
+            return "closed"
+        if time.monotonic() >= self._open_until:
+            return "half-open"
+        return "open"
+
+    def check(self, provider):
+        state = self.state
+        if state == "open" or (state == "half-open" and self._trial_in_flight):
+            retry_in = max(0.0, self._open_until - time.monotonic())
+            raise CircuitOpenError(provider, retry_in)
+        if state == "half-open":
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def end_trial(self):
+        """Release the half-open trial slot without recording an outcome (e.g. on cancellation)."""
+        self._trial_in_flight = False
+
+    def open_for(self, seconds):
+        """Open the circuit for at least `seconds`, e.g. when the provider asks us to back off."""
+        until = time.monotonic() + seconds
+        if self._open_until is None or until > self._open_until:
+            self._open_until = until
+        self._trial_in_flight = False
+
+    def record_success(self):
+        self._failures = 0
+        self._open_until = None
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self._failures += 1
+        self._trial_in_flight = False
+        if self._open_until is not None or self._failures >= self.failure_threshold:
+            self.open_for(self.reset_timeout)
+
+
+class ProviderLimiter:
+    def __init__(self, name, rate, burst, max_retries=3, base_backoff=1.0, max_backoff=30.0,
+                 failure_threshold=5, reset_timeout=30.0, cache_size=256):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+
+    def _backoff(self, attempt):
+        delay = min(self.max_backoff, self.base_backoff * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.0)
+
+    async def call(self, do_request, logger=None):
+        """Run `do_request()` -> (status, headers, body) under the rate limit.
+
+        Retries 429/5xx and transport errors, honouring Retry-After in full. A
+        Retry-After longer than `max_backoff` is not waited out: the circuit
+        opens for that long and the response is returned straight away. Returns
+        the last (status, headers, body); raises CircuitOpenError when the
+        circuit is open, or the last transport error once retries are exhausted.
+        """
+        for attempt in range(self.max_retries + 1):
+            trial = self.breaker.check(self.name)
+            last_attempt = attempt == self.max_retries
+            try:
+                await self.bucket.acquire()
+                status, headers, body = await do_request()
+            except Exception as e:
+                self.breaker.record_failure()
+                if last_attempt:
+                    raise
+                delay = self._backoff(attempt)
+                if logger:
+                    logger.warning(f"🔁 {self.name}: {type(e).__name__}, retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                # Cancelled mid-request: free the half-open trial slot, or no
+                # caller would ever be let through to close the circuit again
+                if trial:
+                    self.breaker.end_trial()
+                raise
+
+            if status != 429 and status < 500:
+                self.breaker.record_success()
+                return status, headers, body
+
+            self.breaker.record_failure()
+            retry_after = parse_retry_after(headers.get("Retry-After"))
+            delay = retry_after if retry_after is not None else self._backoff(attempt)
+            if status == 429:
+                self.bucket.pause(delay)
+            if delay > self.max_backoff:
+                # Longer than we are willing to wait: fail fast and keep every
+                # caller off the provider until the window has passed
+                self.breaker.open_for(delay)
+                if logger:
+                    logger.warning(f"⛔ {self.name}: HTTP {status}, Retry-After {delay:.0f}s, circuit open")
+                return status, headers, body
+            if last_attempt:
+                return status, headers, body
+            if logger:
+                logger.warning(f"🔁 {self.name}: HTTP {status}, retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    def remember(self, key, value):
+        """Keep the last good response for `key` as a fallback."""
+        self._cache[key] = value
+        self._cache.move_to_end(key)
+        while len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+
+    def recall(self, key):
+        return self._cache.get(key)
+
+
+def build_limiters(share=1):
+    """Limiters for every provider, configured from `<PROVIDER>_RATE_PER_S` / `<PROVIDER>_BURST`.
+
+    Each quota is split `share` ways, or `<PROVIDER>_SHARE` ways when that is set.
+    """
+    limiters = {}
+    for name, (rate, burst) in PROVIDER_DEFAULTS.items():
+        provider_share = int(os.getenv(f"{name.upper()}_SHARE", share))
+        rate = float(os.getenv(f"{name.upper()}_RATE_PER_S", rate)) / provider_share
+        burst = max(1, int(os.getenv(f"{name.upper()}_BURST", burst)) // provider_share)
+        limiters[name] = ProviderLimiter(name, rate, burst)
+    return limiters
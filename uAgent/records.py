@@ -0,0 +1,144 @@
+"""Typed records for valuation inputs and outputs.
+
+Plain `__slots__` classes keep bulk runs small (no per-instance __dict__) and
+validate on construction, so a malformed provider payload or LLM answer is
+rejected before it reaches the prompt or costs gas on-chain. Score ranges
+match the `require(... <= 100)` checks in RWAToken.sol.
+"""
+import re
+import time
+
+SCORE_MIN = 0
+SCORE_MAX = 100
+# Column widths in the history store (see history_store.py)
+VALUATION_MAX = 2 ** 63 - 1
+SIZE_SQM_MAX = 2 ** 31 - 1
+# An LLM valuation more than this factor away from the current one is rejected
+VALUATION_CHANGE_FACTOR = 10
+
+# Property ids end up in file paths (see history_store.py), so keep them plain
+PROPERTY_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]+")
+
+
+class ValidationError(ValueError):
+    """Raised when a record field is missing, mistyped or out of range."""
+
+
+def _int_field(data, name, minimum=0, maximum=None):
+    if name not in data or data[name] is None:
+        raise ValidationError(f"{name} is required")
+    value = data[name]
+    # bool is an int subclass; reject it explicitly
+    if isinstance(value, bool):
+        raise ValidationError(f"{name} must be an integer, got {value!r}")
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    elif isinstance(value, str) and value.strip().isdecimal():
+        value = int(value.strip())
+    if not isinstance(value, int):
+        raise ValidationError(f"{name} must be an integer, got {value!r}")
+    if value < minimum or (maximum is not None and value > maximum):
+        bounds = f"[{minimum}, {maximum}]" if maximum is not None else f">= {minimum}"
+        raise ValidationError(f"{name} must be {bounds}, got {value}")
+    return value
+
+
+def _str_field(data, name):
+    value = data.get(name)
+    if not isinstance(value, str) or not value.strip():
+        raise ValidationError(f"{name} must be a non-empty string, got {value!r}")
+    return value
+
+
+def _property_id_field(data):
+    value = _str_field(data, "property_id")
+    if not PROPERTY_ID_PATTERN.fullmatch(value):
+        raise ValidationError(f"property_id may only contain letters, digits, '_' and '-', got {value!r}")
+    return value
+
+
+PROPERTY_FIELDS = ("property_id", "address", "valuation_usd", "size_sqm", "default_risk_score", "location_score")
+
+
+class Property:
+    __slots__ = PROPERTY_FIELDS
+
+    def __init__(self, property_id, address, valuation_usd, size_sqm, default_risk_score, location_score):
+        self.property_id = property_id
+        self.address = address
+        self.valuation_usd = valuation_usd
+        self.size_sqm = size_sqm
+        self.default_risk_score = default_risk_score
+        self.location_score = location_score
+
+    @classmethod
+    def from_dict(cls, data):
+        if not isinstance(data, dict):
+            raise ValidationError(f"expected an object, got {type(data).__name__}")
+        return cls(
+            property_id=_property_id_field(data),
+            address=_str_field(data, "address"),
+            valuation_usd=_int_field(data, "valuation_usd", maximum=VALUATION_MAX),
+            size_sqm=_int_field(data, "size_sqm", maximum=SIZE_SQM_MAX),
+            default_risk_score=_int_field(data, "default_risk_score", SCORE_MIN, SCORE_MAX),
+            location_score=_int_field(data, "location_score", SCORE_MIN, SCORE_MAX),
+        )
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in PROPERTY_FIELDS}
+
+    def __repr__(self):
+        return f"Property({self.property_id!r}, {self.address!r})"
+
+
+class Valuation(Property):
+    """An analysis result for a property, ready to be written on-chain."""
+
+    __slots__ = ()
+
+    @classmethod
+    def from_llm(cls, data, prop):
+        """Validate an LLM answer for `prop`. Identity fields and size always come from `prop`."""
+        if not isinstance(data, dict):
+            raise ValidationError(f"expected a JSON object, got {type(data).__name__}")
+        merged = {
+            **{k: v for k, v in data.items() if v is not None},
+            "property_id": prop.property_id,
+            "address": prop.address,
+            "size_sqm": prop.size_sqm,
+        }
+        valuation = cls.from_dict(merged)
+        if valuation.valuation_usd == 0:
+            raise ValidationError("valuation_usd must be positive")
+        if prop.valuation_usd > 0:
+            low = prop.valuation_usd // VALUATION_CHANGE_FACTOR
+            high = prop.valuation_usd * VALUATION_CHANGE_FACTOR
+            if not low <= valuation.valuation_usd <= high:
+                raise ValidationError(
+                    f"valuation_usd {valuation.valuation_usd} is more than {VALUATION_CHANGE_FACTOR}x "
+                    f"away from the current {prop.valuation_usd}"
+                )
+        return valuation
+
+    def __repr__(self):
+        return (
+            f"Valuation({self.property_id!r}, ${self.valuation_usd:,}, "
+            f"risk={self.default_risk_score}, location={self.location_score})"
+        )
+
+
+class ProviderSnapshot:
+    """A provider payload for one property, as fed into the valuation prompt."""
+
+    __slots__ = ("provider", "property_id", "fetched_at", "data")
+
+    def __init__(self, provider, property_id, data, fetched_at=None):
+        if not isinstance(data, (dict, list)):
+            raise ValidationError(f"{provider} payload must be JSON, got {type(data).__name__}")
+        self.provider = provider
+        self.property_id = property_id
+        self.data = data
+        self.fetched_at = time.time() if fetched_at is None else fetched_at
+
+    def __repr__(self):
+        return f"ProviderSnapshot({self.provider!r}, {self.property_id!r}, fetched_at={self.fetched_at:.0f})"
@@ -0,0 +1,149 @@
+"""Incremental client for the app's /api/fetch-data token feed.
+
+Feed contract (v1):
+
+    GET /api/fetch-data?since=<version>
+    If-None-Match: <etag>          (optional)
+    Accept-Encoding: gzip, deflate
+
+    304 Not Modified               -> nothing changed since <version>
+    200 {
+      "version": "<opaque cursor>",
+      "full": false,               # true = `tokens` is the whole universe
+      "tokens": [{...}],           # tokens added or changed since <version>
+      "removed": ["SYMBOL", ...],  # keys (see token_key) of tokens dropped from the universe
+      "market_conditions": ...,    # optional, replaces the previous value
+      "current_index_composition": {...}  # optional, replaces the previous value
+    }
+
+Delta tokens are identified by their symbol (or id/address), prefixed with
+their chain when they carry one, e.g. "base:USDC". A token with none of those
+fields is identified by a hash of its content. `removed` may list these keys
+or the token objects themselves.
+
+A response without "version" (a bare list or dict, as the endpoint returns
+today) is treated as a full snapshot and passed through untouched, so the
+agent works against both the legacy and the delta endpoint. Refresh cost then scales with churn: only
+changed tokens cross the wire and the merged snapshot lives in the agent.
+"""
+import asyncio
+import hashlib
+import json
+
+DEFAULT_FEED_URL = "http://localhost:3000/api/fetch-data"
+DEFAULT_MARKET_CONDITIONS = "Current market conditions data"
+DEFAULT_INDEX_COMPOSITION = "Equal weight distribution"
+
+# Fields tried, in order, to identify a token in the feed
+TOKEN_KEYS = ("symbol", "id", "address")
+# Fields tried, in order, for the chain a token lives on
+CHAIN_KEYS = ("chain", "chain_id", "chainId", "network")
+
+
+def token_key(token):
+    """Stable identity for a delta token, e.g. "base:USDC"; falls back to a hash of its content."""
+    if isinstance(token, dict):
+        chain = next((token[f] for f in CHAIN_KEYS if token.get(f) is not None), None)
+        for field in TOKEN_KEYS:
+            if token.get(field) is not None:
+                return f"{chain}:{token[field]}" if chain is not None else str(token[field])
+    elif isinstance(token, str):
+        return token
+    content = json.dumps(token, separators=(",", ":"), sort_keys=True, default=str)
+    return "#" + hashlib.sha1(content.encode()).hexdigest()[:12]
+
+
+class TokenFeed:
+    def __init__(self, url=DEFAULT_FEED_URL):
+        self.url = url
+        self.version = None
+        self.etag = None
+        self.loaded = False
+        self.tokens = {}  # key -> token, in feed order (delta feed)
+        self.legacy_universe = None  # legacy payload, kept exactly as served
+        self.market_conditions = DEFAULT_MARKET_CONDITIONS
+        self.current_index_composition = DEFAULT_INDEX_COMPOSITION
+        self._lock = None  # created on first use so it binds to the running loop
+
+    def snapshot(self):
+        """The merged feed in the shape analyze_with_as1 expects."""
+        return {
+            "token_universe": self.legacy_universe if self.legacy_universe is not None else list(self.tokens.values()),
+            "market_conditions": self.market_conditions,
+            "current_index_composition": self.current_index_composition,
+        }
+
+    def apply(self, payload):
+        """Merge a feed response into the local snapshot. Returns the number of tokens touched."""
+        if isinstance(payload, list):
+            payload = {"token_universe": payload}
+        if not isinstance(payload, dict):
+            raise ValueError(f"unexpected feed payload: {type(payload).__name__}")
+
+        if "version" not in payload:
+            # Legacy endpoint: the whole universe every time. Tokens are not
+            # keyed here, so entries that share a symbol are all kept
+            tokens = payload.get("token_universe", payload)
+            self.tokens = {}
+            self.legacy_universe = tokens
+            self.version = None
+            changed = len(tokens) if isinstance(tokens, list) else 1
+        else:
+            tokens = payload.get("tokens", [])
+            removed = payload.get("removed", [])
+            if payload.get("full"):
+                self.tokens = {}
+            self.legacy_universe = None
+            for token in tokens:
+                self.tokens[token_key(token)] = token
+            for token in removed:
+                self.tokens.pop(token_key(token), None)
+            self.version = payload["version"]
+            changed = len(tokens) + len(removed)
+
+        if "market_conditions" in payload:
+            self.market_conditions = payload["market_conditions"]
+        if "current_index_composition" in payload:
+            self.current_index_composition = payload["current_index_composition"]
+        self.loaded = True
+        return changed
+
+    async def refresh(self, ctx):
+        """Pull changes since the last version. Returns the merged snapshot, or None if never loaded."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            try:
+                status = await self._fetch(ctx)
+                if status == 410 and self.version is not None:
+                    # Cursor expired on the server: start over with a full snapshot
+                    ctx.logger.warning("Token feed cursor expired, reloading full snapshot")
+                    self.version, self.etag = None, None
+                    status = await self._fetch(ctx)
+                if status not in (200, 304):
+                    ctx.logger.error(f"Failed to fetch data. Status: {status}")
+            except Exception as e:
+                ctx.logger.error(f"Error fetching data from API: {str(e)}")
+            return self.snapshot() if self.loaded else None
+
+    async def _fetch(self, ctx):
+        import aiohttp
+
+        params = {"since": self.version} if self.version is not None else {}
+        # aiohttp decompresses gzip/deflate responses transparently
+        headers = {"Accept-Encoding": "gzip, deflate"}
+        if self.etag and self.loaded:
+            headers["If-None-Match"] = self.etag
+        async with aiohttp.ClientSession() as session:
+            async with session.get(self.url, params=params, headers=headers) as response:
+                if response.status == 304:
+                    ctx.logger.info(f"Token feed unchanged (version {self.version})")
+                elif response.status == 200:
+                    changed = self.apply(await response.json())
+                    self.etag = response.headers.get("ETag")
+                    total = len(self.snapshot()["token_universe"])
+                    ctx.logger.info(
+                        f"Token feed refreshed: {changed} changed, {total} total "
+                        f"(version {self.version})"
+                    )
+                return response.status
@@ -0,0 +1,82 @@
+"""Bounded async work queue for serving agent requests.
+
+- A fixed number of workers bounds how many jobs run concurrently.
+- Identical requests (same key) that arrive while one is queued or running are
+  attached to it and all senders get the same reply.
+- When the queue is full, `submit` returns False so the caller can reply with
+  a backpressure message instead of buffering without limit.
+"""
+import asyncio
+
+
+class WorkQueue:
+    def __init__(self, name, error_reply, maxsize=32, concurrency=2):
+        """
+        name         -- used in log lines
+        error_reply  -- callable(key, exception) -> Model sent when a job raises
+        maxsize      -- maximum number of queued (not yet running) jobs
+        concurrency  -- number of worker tasks
+        """
+        self.name = name
+        self.maxsize = maxsize
+        self.concurrency = concurrency
+        self._error_reply = error_reply
+        self._queue = None  # created in start() so it binds to the agent's loop
+        self._in_flight = {}  # key -> [(ctx, sender), ...]
+        self._workers = []
+
+    def start(self):
+        """Spawn the worker tasks. Must be called from a running event loop."""
+        if self._workers:
+            return
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        for i in range(self.concurrency):
+            self._workers.append(asyncio.create_task(self._worker(i)))
+
+    @property
+    def depth(self):
+        return self._queue.qsize()
+
+    def submit(self, ctx, sender, key, job):
+        """Queue `job` (a zero-arg coroutine function returning a reply Model).
+
+        Returns True when the request was queued or merged with an identical
+        in-flight one, False when the queue is full.
+        """
+        waiters = self._in_flight.get(key)
+        if waiters is not None:
+            waiters.append((ctx, sender))
+            ctx.logger.info(f"🔁 [{self.name}] Joined in-flight request {key} ({len(waiters)} waiting)")
+            return True
+
+        try:
+            self._queue.put_nowait((key, job))
+        except asyncio.QueueFull:
+            ctx.logger.warning(f"🚦 [{self.name}] Queue full ({self.maxsize}), rejecting {key}")
+            return False
+
+        self._in_flight[key] = [(ctx, sender)]
+        ctx.logger.info(f"📥 [{self.name}] Queued {key} (depth {self.depth})")
+        return True
+
+    async def _worker(self, worker_id):
+        while True:
+            key, job = await self._queue.get()
+            waiters = self._in_flight[key]
+            logger = waiters[0][0].logger
+            logger.info(f"⚙️ [{self.name}] Worker {worker_id} running {key}")
+            try:
+                reply = await job()
+            except Exception as e:
+                logger.error(f"💥 [{self.name}] Job {key} failed: {str(e)}")
+                reply = self._error_reply(key, e)
+            finally:
+                # Detach before replying so new identical requests start a fresh job
+                waiters = self._in_flight.pop(key, waiters)
+                self._queue.task_done()
+
+            for ctx, sender in waiters:
+                try:
+                    await ctx.send(sender, reply)
+                except Exception as e:
+                    ctx.logger.error(f"💥 [{self.name}] Failed to reply to {sender}: {str(e)}")